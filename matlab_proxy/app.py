@@ -612,48 +612,42 @@ async def matlab_view(req):
     # Standard HTTP Request
     else:
         # Proxy, injecting request header
-        async with aiohttp.ClientSession(
-            trust_env=True,
-            connector=aiohttp.TCPConnector(verify_ssl=False),
-        ) as client_session:
-            try:
-                req_body = await transform_body(req)
-                req_url = await transform_request_url(
-                    req, matlab_base_url=matlab_base_url
-                )
-                # Set content length in case of modification
-                reqH["Content-Length"] = str(len(req_body))
-                reqH["x-forwarded-proto"] = "http"
-
-                async with client_session.request(
-                    req.method,
-                    req_url,
-                    headers={**reqH, **{"mwapikey": mwapikey}},
-                    allow_redirects=False,
-                    data=req_body,
-                    params=None,
-                ) as res:
-                    headers = res.headers.copy()
-                    body = await res.read()
-                    headers.update(req.app["settings"]["mwi_custom_http_headers"])
-                    return web.Response(headers=headers, status=res.status, body=body)
-
-            # Handles any pending HTTP requests from the browser when the MATLAB process is terminated before responding to them.
-            except (
-                client_exceptions.ServerDisconnectedError,
-                client_exceptions.ClientConnectionError,
-            ):
-                logger.debug(
-                    "Failed to forward HTTP request as MATLAB process may not be running."
-                )
-                raise web.HTTPServiceUnavailable()
+        # The client session is shared across requests so that connections to MATLAB are reused.
+        client_session = req.app["matlab_http_session"]
+        try:
+            req_body = await transform_body(req)
+            req_url = await transform_request_url(req, matlab_base_url=matlab_base_url)
+            # Set content length in case of modification
+            reqH["Content-Length"] = str(len(req_body))
+            reqH["x-forwarded-proto"] = "http"
+
+            async with client_session.request(
+                req.method,
+                req_url,
+                headers={**reqH, **{"mwapikey": mwapikey}},
+                allow_redirects=False,
+                data=req_body,
+                params=None,
+            ) as res:
+                headers = res.headers.copy()
+                body = await res.read()
+                headers.update(req.app["settings"]["mwi_custom_http_headers"])
+                return web.Response(headers=headers, status=res.status, body=body)
+
+        # Handles any pending HTTP requests from the browser when the MATLAB process is terminated before responding to them.
+        except (
+            client_exceptions.ServerDisconnectedError,
+            client_exceptions.ClientConnectionError,
+        ):
+            logger.debug(
+                "Failed to forward HTTP request as MATLAB process may not be running."
+            )
+            raise web.HTTPServiceUnavailable()
 
-            # Some other exception has been raised (by MATLAB Embedded Connector), log the error and return 404
-            except Exception as err:
-                logger.error(
-                    f"Failed to forward HTTP request to MATLAB with error: {err}"
-                )
-                raise web.HTTPNotFound()
+        # Some other exception has been raised (by MATLAB Embedded Connector), log the error and return 404
+        except Exception as err:
+            logger.error(f"Failed to forward HTTP request to MATLAB with error: {err}")
+            raise web.HTTPNotFound()
 
 
 async def transform_request_url(req, matlab_base_url):
@@ -757,6 +751,26 @@ async def start_background_tasks(app):
     await matlab_starter(app)
 
 
+async def matlab_http_session_ctx(app):
+    """Creates the client session used to forward HTTP requests to MATLAB when the app starts
+    and closes it when the app is cleaned up.
+
+    A single session is reused for all requests so that the connections to the
+    Embedded Connector are kept alive instead of being re-established for every request.
+    Cookies are not stored as they are forwarded as part of the request and response headers.
+
+    Args:
+        app (aiohttp_server): Instance of aiohttp server
+    """
+    session = app["matlab_http_session"] = aiohttp.ClientSession(
+        trust_env=True,
+        cookie_jar=aiohttp.DummyCookieJar(),
+        connector=aiohttp.TCPConnector(verify_ssl=False, limit=0),
+    )
+    yield
+    await session.close()
+
+
 async def cleanup_background_tasks(app):
     """Runs cleanup tasks asynchronously.
     Stops any running tasks and stops matlab asynchronously.
@@ -881,6 +895,7 @@ def create_app(config_name=matlab_proxy.get_default_config_name()):
     app.router.add_route("*", f"{base_url}", root_redirect)
 
     app.router.add_route("*", f"{base_url}/{{proxyPath:.*}}", matlab_view)
+    app.cleanup_ctx.append(matlab_http_session_ctx)
     app.on_cleanup.append(cleanup_background_tasks)
 
     return app
@@ -61,6 +61,9 @@ TESTS_REQUIRES = [
     "urllib3",
     "requests",
     "pytest-playwright",
+    "pytest-xdist",
+    "orjson",
+    "uvloop; sys_platform != 'win32'",
 ]
 
 INSTALL_REQUIRES = ["aiohttp>=3.7.4", "psutil", "aiohttp_session[secure]"]
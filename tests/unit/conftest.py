@@ -6,16 +6,42 @@
 import os
 import shutil
 import asyncio
+import tempfile
 
 import pytest
 from matlab_proxy import settings, util
 from matlab_proxy.util.mwi import environment_variables as mwi_env
 
+try:
+    # uvloop is not available on Windows
+    import uvloop
+except ImportError:
+    uvloop = None
+
 
 def pytest_generate_tests(metafunc):
     os.environ[mwi_env.get_env_name_development()] = "true"
 
 
+def pytest_configure(config):
+    """Gives each pytest-xdist worker its own temp directory.
+
+    The tests store the MATLAB config file and logs in the temp directory, which is deleted
+    once the session finishes. Sharing it would let a worker delete files which are still
+    in use by the other workers.
+    """
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker:
+        tempfile.tempdir = os.path.join(tempfile.gettempdir(), f"matlab-proxy-{worker}")
+        os.makedirs(tempfile.tempdir, exist_ok=True)
+
+
+def pytest_unconfigure(config):
+    """Deletes the temp directory created for the pytest-xdist worker by pytest_configure."""
+    if os.environ.get("PYTEST_XDIST_WORKER"):
+        shutil.rmtree(tempfile.tempdir, ignore_errors=True)
+
+
 def __get_matlab_config_file():
     return settings.get(dev=True)["matlab_config_file"]
 
@@ -59,9 +85,18 @@ def event_loop():
     python <= 3.7 where WindowsSelectorEvent Loop is the default event loop. For
     python >= 3.8, WindowsProactorEvent Loop is the default.
 
+    If uvloop is installed, its event loop is used instead of UnixSelectorEventLoop to reduce
+    the overhead of scheduling callbacks for the HTTP requests sent by the tests.
+
     Yields:
-        asyncio.loop: WindowsProactorEvent loop in Windows or UnixSelectorEventLoop in posix.
+        asyncio.loop: WindowsProactorEvent loop in Windows, uvloop.Loop if uvloop is installed
+        or UnixSelectorEventLoop in posix.
     """
-    loop = util.get_event_loop()
+    if uvloop is not None:
+        loop = uvloop.new_event_loop()
+        asyncio.set_event_loop(loop)
+    else:
+        loop = util.get_event_loop()
+
     yield loop
     loop.close()
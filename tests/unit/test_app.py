@@ -1,8 +1,8 @@
 # Copyright 2020-2024 The MathWorks, Inc.
 
 import asyncio
+import copy
 import datetime
-import json
 import platform
 import random
 import time
@@ -10,13 +10,48 @@ from datetime import timedelta, timezone
 from http import HTTPStatus
 
 import aiohttp
+import orjson
 import pytest
-import tests.unit.test_constants as test_constants
+from aiohttp.test_utils import TestClient, TestServer
 
 from matlab_proxy import app, util
 from matlab_proxy.util.mwi import environment_variables as mwi_env
 from matlab_proxy.util.mwi.exceptions import EntitlementError, MatlabInstallError
 
+# Request bodies for the "/set_licensing_info" tests, serialized once at import
+_NLM_BODY = orjson.dumps(
+    {
+        "type": "nlm",
+        "status": "starting",
+        "version": "R2020b",
+        "connectionString": "123@nlm",
+    }
+)
+_INVALID_BODY = orjson.dumps(
+    {
+        "type": "INVALID_TYPE",
+        "status": "starting",
+        "version": "R2020b",
+        "connectionString": "123@nlm",
+    }
+)
+_MHLM_BODY = orjson.dumps(
+    {
+        "type": "mhlm",
+        "status": "starting",
+        "version": "R2020b",
+        "token": "123@nlm",
+        "emailaddress": "123@nlm",
+        "sourceId": "123@nlm",
+    }
+)
+_EXISTING_BODY = orjson.dumps({"type": "existing_license"})
+
+# MATLAB status as it appears in the body of the "/get_status" response, which is
+# serialized by web.json_response() using the default separators of json.dumps()
+_MATLAB_STATUS_UP = b'"status": "up"'
+_MATLAB_STATUS_DOWN = b'"status": "down"'
+
 
 @pytest.mark.parametrize(
     "no_proxy_user_configuration",
@@ -61,20 +96,34 @@ def test_configure_no_proxy_in_env(monkeypatch, no_proxy_user_configuration):
     )
 
 
-def test_create_app():
+@pytest.fixture(name="fresh_app", scope="session")
+def fresh_app_fixture():
+    """A session scoped pytest fixture which returns an app created by app.create_app()
+
+    The app is not configured or started, so it should only be used by tests which inspect it.
+    Tests which need a running server should use the test_server fixture instead.
+
+    Returns:
+        aiohttp.web.Application: An aiohttp web server.
+    """
+    return app.create_app()
+
+
+def test_create_app(fresh_app):
     """Test if aiohttp server is being created successfully.
 
     Checks if the aiohttp server is created successfully, routes, startup and cleanup
     tasks are added.
-    """
-    test_server = app.create_app()
 
+    Args:
+        fresh_app (aiohttp.web.Application): An aiohttp web server which is not started.
+    """
     # Verify router is configured with some routes
-    assert test_server.router._resources is not None
+    assert fresh_app.router._resources is not None
 
     # Verify app server has a cleanup task
     # By default there is 1 for clean up task
-    assert len(test_server.on_cleanup) > 1
+    assert len(fresh_app.on_cleanup) > 1
 
 
 def get_email():
@@ -95,9 +144,34 @@ def get_connection_string():
     return "nlm@localhost.com"
 
 
-async def wait_for_matlab_to_be_up(test_server, sleep_seconds):
-    """Checks at max five times for the MATLAB status to be up and throws ConnectionError
-    if MATLAB status is not up.
+async def wait_for(predicate, deadline_s=15):
+    """Awaits predicate with exponential backoff until it returns True or the deadline expires.
+
+    The delay between attempts starts at 50 milliseconds and doubles up to a cap of
+    250 milliseconds, so that fast state transitions are detected quickly while slow ones
+    are still given enough time.
+
+    Args:
+        predicate (Coroutine function): Returns True once the awaited condition is met.
+        deadline_s (int, optional): Seconds to wait before giving up. Defaults to 15.
+
+    Raises:
+        TimeoutError: If predicate does not return True before the deadline.
+    """
+    deadline = time.monotonic() + deadline_s
+    delay = 0.05
+    while time.monotonic() < deadline:
+        if await predicate():
+            return
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+    raise TimeoutError
+
+
+async def wait_for_matlab_to_be_up(test_server):
+    """Waits for the MATLAB status to be up and throws TimeoutError if MATLAB status
+    is not up before the deadline.
 
     This function mitigates the scenario where the tests may try to send the request
     to the test server and the MATLAB status is not up yet which may cause the test to fail
@@ -108,23 +182,15 @@ async def wait_for_matlab_to_be_up(test_server, sleep_seconds):
 
     Args:
         test_server (aiohttp_client) : A aiohttp_client server to send HTTP GET request.
-        sleep_seconds : Seconds to be sent to the asyncio.sleep method
     """
 
-    count = 0
-    while True:
+    async def is_matlab_up():
+        # Probe the raw response body instead of parsing it on every attempt
         resp = await test_server.get("/get_status")
         assert resp.status == HTTPStatus.OK
+        return _MATLAB_STATUS_UP in await resp.read()
 
-        resp_json = json.loads(await resp.text())
-
-        if resp_json["matlab"]["status"] == "up":
-            break
-        else:
-            count += 1
-            await asyncio.sleep(sleep_seconds)
-            if count > test_constants.FIVE_MAX_TRIES:
-                raise ConnectionError
+    await wait_for(is_matlab_up)
 
 
 @pytest.fixture(
@@ -194,18 +260,19 @@ def test_marshal_licensing_info(licensing_data):
     assert app.marshal_licensing_info(actual_licensing_info) == expected_licensing_info
 
 
+_MATLAB_INSTALL_ERROR = MatlabInstallError("'matlab' executable not found in PATH")
+_MATLAB_INSTALL_ERROR_EXPECTED = {
+    "message": str(_MATLAB_INSTALL_ERROR),
+    "logs": None,
+    "type": MatlabInstallError.__name__,
+}
+
+
 @pytest.mark.parametrize(
     "actual_error, expected_error",
     [
         (None, None),
-        (
-            MatlabInstallError("'matlab' executable not found in PATH"),
-            {
-                "message": "'matlab' executable not found in PATH",
-                "logs": None,
-                "type": MatlabInstallError.__name__,
-            },
-        ),
+        (_MATLAB_INSTALL_ERROR, _MATLAB_INSTALL_ERROR_EXPECTED),
     ],
     ids=["No error", "Raise Matlab Install Error"],
 )
@@ -223,46 +290,135 @@ def test_marshal_error(actual_error, expected_error):
 
 
 class FakeServer:
-    """Context Manager class which returns a web server wrapped in aiohttp_client pytest fixture
+    """Context Manager class which returns a web server wrapped in an aiohttp TestClient
     for testing.
 
     The server setup and startup does not need to mimic the way it is being done in main() method in app.py.
     Setting up the server in the context of Pytest.
     """
 
-    def __init__(self, loop, aiohttp_client):
+    def __init__(self, loop):
         self.loop = loop
-        self.aiohttp_client = aiohttp_client
 
     def __enter__(self):
         server = app.create_app()
         self.server = app.configure_and_start(server)
-        return self.loop.run_until_complete(self.aiohttp_client(self.server))
+        self.client = self.loop.run_until_complete(self.__start_client())
+        return self.client
+
+    async def __start_client(self):
+        # Keep the connections to the server alive so that they are reused across requests
+        client = TestClient(
+            TestServer(self.server),
+            connector=aiohttp.TCPConnector(limit=0, keepalive_timeout=30),
+        )
+        await client.start_server()
+        return client
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
         self.loop.run_until_complete(self.server.shutdown())
         self.loop.run_until_complete(self.server.cleanup())
+        self.loop.run_until_complete(self.client.close())
+
+
+@pytest.fixture(name="shared_test_server", scope="module")
+def shared_test_server_fixture(event_loop):
+    """A module scoped pytest fixture which yields a test server shared by the tests in this module.
+
+    Starting the server launches the fake MATLAB, so the server is created once and reused
+    instead of being recreated for every test. Tests should request the test_server fixture
+    which restores the state of this server after each test.
+
+    Args:
+        event_loop (Event loop): The session scoped event loop provided by conftest.py
+
+    Yields:
+        TestClient : A TestClient wrapping the server used by tests.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        # Disabling the authentication token mechanism explicitly
+        mp.setenv(mwi_env.get_env_name_enable_mwi_auth_token(), "False")
+        try:
+            with FakeServer(event_loop) as test_server:
+                yield test_server
+        except ProcessLookupError:
+            pass
+
+
+async def restore_server_state(test_server, licensing, error, matlab_version):
+    """Restores the licensing, error and MATLAB state of test_server after a test has modified it.
+
+    In testing mode the server is licensed using the NLM connection string from the environment,
+    which is never cached. So licensing is restored on the state directly instead of through
+    "/set_licensing_info", any config file cached by the test is deleted and MATLAB is restarted.
+
+    Args:
+        test_server (TestClient): The shared test server.
+        licensing (Dict): Licensing information of the server before the test was run.
+        error (Exception): Error set on the server before the test was run.
+        matlab_version (String): MATLAB version in the settings before the test was run.
+    """
+    state = test_server.server.app["state"]
+    state.error = error
+    test_server.server.app["settings"]["matlab_version"] = matlab_version
+
+    if state.licensing != licensing:
+        state.licensing = licensing
+        test_server.server.app["settings"]["matlab_config_file"].unlink(missing_ok=True)
+        resp = await test_server.put("/start_matlab")
+        assert resp.status == HTTPStatus.OK
+
+    elif await state.get_matlab_state() == "down":
+        resp = await test_server.put("/start_matlab")
+        assert resp.status == HTTPStatus.OK
 
 
 @pytest.fixture(name="test_server")
-def test_server_fixture(
-    loop,
-    aiohttp_client,
+def test_server_fixture(shared_test_server, event_loop):
+    """A pytest fixture which yields the shared test server to be used by tests.
+
+    Changes made by the test to the licensing or MATLAB state of the server are reverted
+    once the test completes so that every test starts with a licensed server.
+
+    Args:
+        shared_test_server (TestClient): The module scoped test server.
+        event_loop (Event loop): The session scoped event loop provided by conftest.py
+
+    Yields:
+        TestClient : A TestClient wrapping the server used by tests.
+    """
+    licensing = copy.deepcopy(shared_test_server.server.app["state"].licensing)
+    error = shared_test_server.server.app["state"].error
+    matlab_version = shared_test_server.server.app["settings"]["matlab_version"]
+
+    yield shared_test_server
+
+    event_loop.run_until_complete(
+        restore_server_state(shared_test_server, licensing, error, matlab_version)
+    )
+
+
+@pytest.fixture(name="isolated_test_server")
+def isolated_test_server_fixture(
+    event_loop,
     monkeypatch,
 ):
-    """A pytest fixture which yields a test server to be used by tests.
+    """A pytest fixture which yields a test server that is not shared with other tests.
+
+    Used by tests which either need to modify the environment before the server is created
+    or which shut the server down.
 
     Args:
-        loop (Event loop): The built-in event loop provided by pytest.
-        aiohttp_client (aiohttp_client): Built-in pytest fixture used as a wrapper to the aiohttp web server.
+        event_loop (Event loop): The session scoped event loop provided by conftest.py
+        monkeypatch (_pytest.monkeypatch.MonkeyPatch): To monkeypatch env vars
 
     Yields:
-        aiohttp_client : A aiohttp_client server used by tests.
+        TestClient : A TestClient wrapping the server used by tests.
     """
     # Disabling the authentication token mechanism explicitly
     monkeypatch.setenv(mwi_env.get_env_name_enable_mwi_auth_token(), "False")
     try:
-        with FakeServer(loop, aiohttp_client) as test_server:
+        with FakeServer(event_loop) as test_server:
             yield test_server
     except ProcessLookupError:
         pass
@@ -307,11 +463,37 @@ async def test_get_env_config(test_server):
     resp = await test_server.get("/get_env_config")
     assert resp.status == HTTPStatus.OK
 
-    text = await resp.json()
+    text = orjson.loads(await resp.read())
     assert text is not None
     assert set(expected_json_structure.keys()) == set(text.keys())
 
 
+async def test_read_only_endpoints_concurrent(test_server):
+    """Test to check that the read-only endpoints respond when requested concurrently.
+
+    The requests do not modify the state of the server, so they are sent together and
+    the event loop interleaves them instead of waiting on each round trip in turn.
+
+    Args:
+        test_server (aiohttp_client): A aiohttp_client server for sending GET requests.
+    """
+    status_resp, env_config_resp, auth_token_resp = await asyncio.gather(
+        test_server.get("/get_status"),
+        test_server.get("/get_env_config"),
+        test_server.get("/get_auth_token"),
+    )
+
+    assert status_resp.status == HTTPStatus.OK
+    assert "matlab" in orjson.loads(await status_resp.read())
+
+    assert env_config_resp.status == HTTPStatus.OK
+    assert "matlab" in orjson.loads(await env_config_resp.read())
+
+    assert auth_token_resp.status == HTTPStatus.OK
+    assert orjson.loads(await auth_token_resp.read())["token"] is None
+
+
+@pytest.mark.xdist_group("mutating")
 async def test_start_matlab_route(test_server):
     """Test to check endpoint : "/start_matlab"
 
@@ -322,31 +504,33 @@ async def test_start_matlab_route(test_server):
         test_server (aiohttp_client): A aiohttp_client server to send GET request to.
     """
     # Waiting for the matlab process to start up.
-    sleep_interval = 1
-    await wait_for_matlab_to_be_up(test_server, sleep_interval)
+    await wait_for_matlab_to_be_up(test_server)
 
     # Send get request to end point
-    await test_server.put("/start_matlab")
+    resp = await test_server.put("/start_matlab")
+    assert resp.status == HTTPStatus.OK
 
     # Check if Matlab restarted successfully
     await check_for_matlab_startup(test_server)
 
 
 async def check_for_matlab_startup(test_server):
-    count = 0
-    while True:
+    """Waits for the MATLAB status to move out of "down" and throws TimeoutError
+    if it does not before the deadline.
+
+    Args:
+        test_server (aiohttp_client) : A aiohttp_client server to send HTTP GET request.
+    """
+
+    async def is_matlab_not_down():
         resp = await test_server.get("/get_status")
         assert resp.status == HTTPStatus.OK
-        resp_json = json.loads(await resp.text())
-        if resp_json["matlab"]["status"] != "down":
-            break
-        else:
-            count += 1
-            await asyncio.sleep(0.5)
-            if count > test_constants.FIVE_MAX_TRIES:
-                raise ConnectionError
+        return _MATLAB_STATUS_DOWN not in await resp.read()
+
+    await wait_for(is_matlab_not_down)
 
 
+@pytest.mark.xdist_group("mutating")
 async def test_stop_matlab_route(test_server):
     """Test to check endpoint : "/stop_matlab"
 
@@ -357,7 +541,7 @@ async def test_stop_matlab_route(test_server):
     resp = await test_server.delete("/stop_matlab")
     assert resp.status == HTTPStatus.OK
 
-    resp_json = json.loads(await resp.text())
+    resp_json = orjson.loads(await resp.read())
     assert resp_json["matlab"]["status"] == "down"
 
 
@@ -372,30 +556,33 @@ async def test_root_redirect(test_server):
         test_server (aiohttp_client):  A aiohttp_client server to send HTTP GET request.
 
     """
-    count = 0
-    while True:
+    resp = None
+
+    async def is_root_served():
+        nonlocal resp
         resp = await test_server.get("/")
-        if resp.status == HTTPStatus.SERVICE_UNAVAILABLE:
-            time.sleep(test_constants.ONE_SECOND_DELAY)
-            count += 1
-        else:
-            assert resp.status == HTTPStatus.NOT_FOUND
-            break
+        return resp.status != HTTPStatus.SERVICE_UNAVAILABLE
 
-        if count > test_constants.FIVE_MAX_TRIES:
-            raise ConnectionError
+    await wait_for(is_root_served)
+
+    assert resp.status == HTTPStatus.NOT_FOUND
 
 
 @pytest.fixture(name="proxy_payload")
 def proxy_payload_fixture():
-    """Pytest fixture which returns a Dict representing the payload.
+    """Pytest fixture which returns a Dict representing the payload along with its
+    serialized form.
+
+    The payload is serialized once here so that tests which retry requests do not
+    re-serialize it on every attempt.
 
     Returns:
-        Dict: A Dict representing the payload for HTTP request.
+        Tuple: A Dict representing the payload for HTTP request and its serialized bytes.
     """
     payload = {"messages": {"ClientType": [{"properties": {"TYPE": "jsd"}}]}}
+    payload_bytes = orjson.dumps(payload)
 
-    return payload
+    return payload, payload_bytes
 
 
 async def test_matlab_proxy_404(proxy_payload, test_server):
@@ -403,160 +590,157 @@ async def test_matlab_proxy_404(proxy_payload, test_server):
     for a non-existing file. Should return 404 status code in response
 
     Args:
-        proxy_payload (Dict): Pytest fixture which returns a Dict.
+        proxy_payload (Tuple): Pytest fixture which returns a Dict and its serialized bytes.
         test_server (aiohttp_client): Test server to send HTTP requests.
     """
+    _, proxy_payload_bytes = proxy_payload
 
     headers = {"content-type": "application/json"}
 
     # Request a non-existing html file.
     # Request gets proxied to app.matlab_view() which should raise HTTPNotFound() exception ie. return HTTP status code 404
+    resp = None
 
-    count = 0
-    while True:
+    async def is_request_proxied():
+        nonlocal resp
         resp = await test_server.post(
-            "./1234.html", data=json.dumps(proxy_payload), headers=headers
+            "./1234.html", data=proxy_payload_bytes, headers=headers
         )
-        if resp.status == HTTPStatus.SERVICE_UNAVAILABLE:
-            time.sleep(test_constants.ONE_SECOND_DELAY)
-            count += 1
-        else:
-            assert resp.status == HTTPStatus.NOT_FOUND
-            break
+        return resp.status != HTTPStatus.SERVICE_UNAVAILABLE
 
-        if count > test_constants.FIVE_MAX_TRIES:
-            raise ConnectionError
+    await wait_for(is_request_proxied)
 
+    assert resp.status == HTTPStatus.NOT_FOUND
 
-async def test_matlab_proxy_http_get_request(proxy_payload, test_server):
+
+@pytest.mark.parametrize(
+    "method, path",
+    [
+        ("GET", "/http_get_request.html"),
+        ("PUT", "/http_put_request.html"),
+        ("DELETE", "/http_delete_request.html"),
+    ],
+    ids=["HTTP GET request", "HTTP PUT request", "HTTP DELETE request"],
+)
+async def test_matlab_proxy_http_method(method, path, proxy_payload, test_server):
     """Test to check if test_server proxies a HTTP request to fake matlab server and returns
     the response back
 
     Args:
-        proxy_payload (Dict): Pytest fixture which returns a Dict representing payload for the HTTP request
+        method (String): HTTP method of the request
+        path (String): Path on the fake matlab server which echoes the request body back
+        proxy_payload (Tuple): Pytest fixture which returns a Dict representing payload for the HTTP request and its serialized bytes
         test_server (aiohttp_client): Test server to send HTTP requests.
 
     Raises:
-        ConnectionError: If fake matlab server is not reachable from the test server, raises ConnectionError
+        TimeoutError: If fake matlab server is not reachable from the test server, raises TimeoutError
     """
-
-    max_tries = 5
-    count = 0
-
-    while True:
-        resp = await test_server.get(
-            "/http_get_request.html", data=json.dumps(proxy_payload)
+    _, proxy_payload_bytes = proxy_payload
+    resp = None
+
+    async def is_request_proxied():
+        nonlocal resp
+        resp = await test_server.request(method, path, data=proxy_payload_bytes)
+        return resp.status not in (
+            HTTPStatus.NOT_FOUND,
+            HTTPStatus.SERVICE_UNAVAILABLE,
         )
 
-        if resp.status in (HTTPStatus.NOT_FOUND, HTTPStatus.SERVICE_UNAVAILABLE):
-            time.sleep(1)
-            count += 1
-
-        else:
-            resp_body = await resp.text()
-            assert json.dumps(proxy_payload) == resp_body
-            break
+    await wait_for(is_request_proxied)
 
-        if count > max_tries:
-            raise ConnectionError
+    resp_body = await resp.read()
+    assert proxy_payload_bytes == resp_body
 
 
-async def test_matlab_proxy_http_put_request(proxy_payload, test_server):
-    """Test to check if test_server proxies a HTTP request to fake matlab server and returns
-    the response back
+async def test_matlab_proxy_http_post_request(proxy_payload, isolated_test_server):
+    """Test to check if test_server proxies http post request to fake matlab server.
+    Checks if payload is being modified before proxying.
 
+    The fake matlab server shuts itself down after responding to this request, so this test
+    uses a server which is not shared with other tests.
     Args:
-        proxy_payload (Dict): Pytest fixture which returns a Dict representing payload for the HTTP request
-        test_server (aiohttp_client): Test server to send HTTP requests.
+        proxy_payload (Tuple): Pytest fixture which returns a Dict representing payload for the HTTP Request and its serialized bytes
+        isolated_test_server (TestClient): Test server to send HTTP requests
 
     Raises:
-        ConnectionError: If fake matlab server is not reachable from the test server, raises ConnectionError
+        TimeoutError: If fake matlab server is not reachable from the test server, raises TimeoutError
     """
+    proxy_payload, proxy_payload_bytes = proxy_payload
+    resp = None
 
-    max_tries = 5
-    count = 0
-
-    while True:
-        resp = await test_server.put(
-            "/http_put_request.html", data=json.dumps(proxy_payload)
+    async def is_request_proxied():
+        nonlocal resp
+        resp = await isolated_test_server.post(
+            "/messageservice/json/secure",
+            data=proxy_payload_bytes,
+        )
+        return resp.status not in (
+            HTTPStatus.NOT_FOUND,
+            HTTPStatus.SERVICE_UNAVAILABLE,
         )
 
-        if resp.status in (HTTPStatus.NOT_FOUND, HTTPStatus.SERVICE_UNAVAILABLE):
-            time.sleep(1)
-            count += 1
-
-        else:
-            resp_body = await resp.text()
-            assert json.dumps(proxy_payload) == resp_body
-            break
+    await wait_for(is_request_proxied)
 
-        if count > max_tries:
-            raise ConnectionError
+    resp_json = orjson.loads(await resp.read())
+    assert set(resp_json.keys()).issubset(proxy_payload.keys())
 
 
-async def test_matlab_proxy_http_delete_request(proxy_payload, test_server):
-    """Test to check if test_server proxies a HTTP request to fake matlab server and returns
-    the response back
+def test_matlab_http_session_is_shared(event_loop, monkeypatch, mocker):
+    """Test to check that HTTP requests to the fake matlab server are forwarded using the
+    client session created when the server starts, and that the session is closed when the
+    server shuts down.
 
     Args:
-        proxy_payload (Dict): Pytest fixture which returns a Dict representing payload for the HTTP request
-        test_server (aiohttp_client): Test server to send HTTP requests.
-
-    Raises:
-        ConnectionError: If fake matlab server is not reachable from the test server, raises ConnectionError
+        event_loop (Event loop): The session scoped event loop provided by conftest.py
+        monkeypatch (_pytest.monkeypatch.MonkeyPatch): To monkeypatch env vars
+        mocker (pytest_mock.MockerFixture): To spy on the client session
     """
+    # Disabling the authentication token mechanism explicitly
+    monkeypatch.setenv(mwi_env.get_env_name_enable_mwi_auth_token(), "False")
 
-    max_tries = 5
-    count = 0
+    with FakeServer(event_loop) as test_server:
+        session = test_server.server.app["matlab_http_session"]
+        event_loop.run_until_complete(wait_for_matlab_to_be_up(test_server))
+        request_spy = mocker.spy(session, "request")
 
-    while True:
-        resp = await test_server.delete(
-            "/http_delete_request.html", data=json.dumps(proxy_payload)
-        )
+        for _ in range(2):
+            resp = event_loop.run_until_complete(
+                test_server.get("/http_get_request.html")
+            )
+            assert resp.status == HTTPStatus.OK
 
-        if resp.status in (HTTPStatus.NOT_FOUND, HTTPStatus.SERVICE_UNAVAILABLE):
-            time.sleep(1)
-            count += 1
+        assert test_server.server.app["matlab_http_session"] is session
+        assert request_spy.call_count == 2
+        assert not session.closed
 
-        else:
-            resp_body = await resp.text()
-            assert json.dumps(proxy_payload) == resp_body
-            break
+    assert session.closed
 
-        if count > max_tries:
-            raise ConnectionError
 
+# FIXME: The mhlm case is talking to production loginws endpoint and is resulting in an exception.
+# TODO: Use mocks to test the mhlm workflows is working as expected
+@pytest.mark.xdist_group("mutating")
+@pytest.mark.parametrize(
+    "body, status",
+    [
+        (_NLM_BODY, HTTPStatus.OK),
+        (_INVALID_BODY, HTTPStatus.BAD_REQUEST),
+        (_MHLM_BODY, HTTPStatus.OK),
+        (_EXISTING_BODY, HTTPStatus.OK),
+    ],
+    ids=["nlm", "invalid", "mhlm", "existing"],
+)
+async def test_set_licensing_info_put(body, status, test_server):
+    """Test to check endpoint : "/set_licensing_info"
 
-async def test_matlab_proxy_http_post_request(proxy_payload, test_server):
-    """Test to check if test_server proxies http post request to fake matlab server.
-    Checks if payload is being modified before proxying.
+    Test which sends HTTP PUT request with NLM, INVALID, MHLM and local licensing information.
     Args:
-        proxy_payload (Dict): Pytest fixture which returns a Dict representing payload for the HTTP Request
-        test_server (aiohttp_client): Test server to send HTTP requests
-
-    Raises:
-        ConnectionError: If unable to proxy to fake matlab server raise Connection error
+        body (bytes): Serialized licensing information sent in the HTTP PUT request.
+        status (HTTPStatus): Expected status of the response.
+        test_server (aiohttp_client): A aiohttp_client server to send HTTP GET request.
     """
-    max_tries = 5
-    count = 0
-
-    while True:
-        resp = await test_server.post(
-            "/messageservice/json/secure",
-            data=json.dumps(proxy_payload),
-        )
-
-        if resp.status in (HTTPStatus.NOT_FOUND, HTTPStatus.SERVICE_UNAVAILABLE):
-            time.sleep(1)
-            count += 1
-
-        else:
-            resp_json = await resp.json()
-            assert set(resp_json.keys()).issubset(proxy_payload.keys())
-            break
 
-        if count > max_tries:
-            raise ConnectionError
+    resp = await test_server.put("/set_licensing_info", data=body)
+    assert resp.status == status
 
 
 # While acceessing matlab-proxy directly, the web socket request looks like
@@ -572,133 +756,92 @@ async def test_matlab_proxy_http_post_request(proxy_payload, test_server):
 #     }
 
 
-async def test_set_licensing_info_put_nlm(test_server):
-    """Test to check endpoint : "/set_licensing_info"
-
-    Test which sends HTTP PUT request with NLM licensing information.
-    Args:
-        test_server (aiohttp_client): A aiohttp_client server to send HTTP GET request.
-    """
-
-    data = {
-        "type": "nlm",
-        "status": "starting",
-        "version": "R2020b",
-        "connectionString": "123@nlm",
-    }
-    resp = await test_server.put("/set_licensing_info", data=json.dumps(data))
-    assert resp.status == HTTPStatus.OK
-
+async def test_matlab_proxy_web_socket(test_server):
+    """Test to check if test_server proxies web socket request to fake matlab server
 
-async def test_set_licensing_info_put_invalid_license(test_server):
-    """Test to check endpoint : "/set_licensing_info"
+    The web socket request headers sent when accessing matlab-proxy directly and through nginx
+    are both checked, one after the other, over the same test server.
 
-    Test which sends HTTP PUT request with INVALID licensing information type.
     Args:
-        test_server (aiohttp_client): A aiohttp_client server to send HTTP GET request.
+        test_server (aiohttp_client): Test Server to send HTTP Requests.
     """
-
-    data = {
-        "type": "INVALID_TYPE",
-        "status": "starting",
-        "version": "R2020b",
-        "connectionString": "123@nlm",
-    }
-    resp = await test_server.put("/set_licensing_info", data=json.dumps(data))
-    assert resp.status == HTTPStatus.BAD_REQUEST
-
-
-@pytest.mark.parametrize(
-    "headers",
-    [
+    websocket_response_string = (
+        "Hello world"  # This string is set by the web_socket_handler in devel.py
+    )
+    headers_list = [
+        # Uppercase header
         {
             "connection": "Upgrade",
             "Upgrade": "websocket",
         },
+        # Lowercase header
         {
             "connection": "upgrade",
             "upgrade": "websocket",
         },
-    ],
-    ids=["Uppercase header", "Lowercase header"],
-)
-async def test_matlab_proxy_web_socket(test_server, headers):
-    """Test to check if test_server proxies web socket request to fake matlab server
-
-    Args:
-        test_server (aiohttp_client): Test Server to send HTTP Requests.
-    """
+    ]
 
-    sleep_interval = 1
-    await wait_for_matlab_to_be_up(test_server, sleep_interval)
-    resp = await test_server.ws_connect("/http_ws_request.html/", headers=headers)
-    text = await resp.receive()
-    websocket_response_string = (
-        "Hello world"  # This string is set by the web_socket_handler in devel.py
-    )
-    assert text.type == aiohttp.WSMsgType.TEXT
-    assert text.data == websocket_response_string
+    await wait_for_matlab_to_be_up(test_server)
+    for headers in headers_list:
+        resp = await test_server.ws_connect("/http_ws_request.html/", headers=headers)
+        text = await resp.receive()
+        assert text.type == aiohttp.WSMsgType.TEXT
+        assert text.data == websocket_response_string
+        await resp.close()
 
 
-async def test_set_licensing_info_put_mhlm(test_server):
+@pytest.mark.xdist_group("mutating")
+async def test_set_licensing_info_delete(test_server):
     """Test to check endpoint : "/set_licensing_info"
 
-    Test which sends HTTP PUT request with MHLM licensing information.
+    Test which sends HTTP DELETE request to remove licensing. Checks if licensing is set to None
+    After request is sent.
     Args:
-        test_server (aiohttp_client): A aiohttp_client server to send HTTP GET request.
+        test_server (aiohttp_client):  A aiohttp_client server to send HTTP GET request.
     """
-    # FIXME: This test is talking to production loginws endpoint and is resulting in an exception.
-    # TODO: Use mocks to test the mhlm workflows is working as expected
-    data = {
-        "type": "mhlm",
-        "status": "starting",
-        "version": "R2020b",
-        "token": "123@nlm",
-        "emailaddress": "123@nlm",
-        "sourceId": "123@nlm",
-    }
-    resp = await test_server.put("/set_licensing_info", data=json.dumps(data))
-    assert resp.status == HTTPStatus.OK
 
+    resp = await test_server.delete("/set_licensing_info")
+    resp_json = orjson.loads(await resp.read())
+    assert resp.status == HTTPStatus.OK and resp_json["licensing"] is None
 
-async def test_set_licensing_info_put_existing_license(test_server):
-    """Test to check endpoint : "/set_licensing_info"
 
-    Test which sends HTTP PUT request with local licensing information.
+@pytest.mark.xdist_group("mutating")
+async def test_restore_server_state_does_not_cache_licensing(test_server):
+    """Test to check that restoring the licensing of the shared test server does not leave
+    a cached config file behind.
+
+    Servers created later would launch MATLAB with the cached licensing, which makes the
+    outcome of tests using their own server depend on the order in which tests are run.
     Args:
-        test_server (aiohttp_client): A aiohttp_client server to send HTTP GET request.
+        test_server (aiohttp_client): A aiohttp_client server to send HTTP PUT request.
     """
+    state = test_server.server.app["state"]
+    settings = test_server.server.app["settings"]
+    licensing = copy.deepcopy(state.licensing)
 
-    data = {"type": "existing_license"}
-    resp = await test_server.put("/set_licensing_info", data=json.dumps(data))
+    resp = await test_server.put("/set_licensing_info", data=_EXISTING_BODY)
     assert resp.status == HTTPStatus.OK
+    assert settings["matlab_config_file"].exists()
 
+    await restore_server_state(
+        test_server, licensing, state.error, settings["matlab_version"]
+    )
 
-async def test_set_licensing_info_delete(test_server):
-    """Test to check endpoint : "/set_licensing_info"
-
-    Test which sends HTTP DELETE request to remove licensing. Checks if licensing is set to None
-    After request is sent.
-    Args:
-        test_server (aiohttp_client):  A aiohttp_client server to send HTTP GET request.
-    """
-
-    resp = await test_server.delete("/set_licensing_info")
-    resp_json = json.loads(await resp.text())
-    assert resp.status == HTTPStatus.OK and resp_json["licensing"] is None
+    assert state.licensing == licensing
+    assert not settings["matlab_config_file"].exists()
 
 
-async def test_set_termination_integration_delete(test_server):
+async def test_set_termination_integration_delete(isolated_test_server):
     """Test to check endpoint : "/terminate_integration"
 
     Test which sends HTTP DELETE request to terminate integration. Checks if integration is terminated
     successfully.
     Args:
-        test_server (aiohttp_client):  A aiohttp_client server to send HTTP GET request.
+        isolated_test_server (TestClient):  A test server, not shared with other tests, to send HTTP GET request.
     """
     try:
-        resp = await test_server.delete("/terminate_integration")
-        resp_json = json.loads(await resp.text())
+        resp = await isolated_test_server.delete("/terminate_integration")
+        resp_json = orjson.loads(await resp.read())
         assert resp.status == HTTPStatus.OK and resp_json["loadUrl"] == "../"
     except ProcessLookupError:
         pass
@@ -735,8 +878,8 @@ def non_default_host_interface_fixture(monkeypatch):
 
 # For pytest fixtures, order of arguments matter.
 # First set the default host interface to a non-default value
-# Then set MWI_TEST to false and then create an instance of the test_server
-# This order will set the test_server with appropriate values.
+# Then set MWI_TEST to false and then create an instance of the isolated_test_server
+# This order will set the isolated_test_server with appropriate values.
 
 
 @pytest.mark.skipif(
@@ -744,20 +887,20 @@ def non_default_host_interface_fixture(monkeypatch):
     reason="Testing the windows access URL",
 )
 def test_get_access_url_non_dev_windows(
-    non_default_host_interface, non_test_env, test_server
+    non_default_host_interface, non_test_env, isolated_test_server
 ):
     """Test to check access url to be 127.0.0.1 in non-dev mode on Windows"""
-    assert "127.0.0.1" in util.get_access_url(test_server.app)
+    assert "127.0.0.1" in util.get_access_url(isolated_test_server.app)
 
 
 @pytest.mark.skipif(
     platform.system() == "Windows", reason="Testing the non-Windows access URL"
 )
 def test_get_access_url_non_dev_posix(
-    non_default_host_interface, non_test_env, test_server
+    non_default_host_interface, non_test_env, isolated_test_server
 ):
     """Test to check access url to be 0.0.0.0 in non-dev mode on Linux/Darwin"""
-    assert "0.0.0.0" in util.get_access_url(test_server.app)
+    assert "0.0.0.0" in util.get_access_url(isolated_test_server.app)
 
 
 @pytest.fixture(name="set_licensing_info_mock_fetch_single_entitlement")
@@ -860,7 +1003,7 @@ async def set_licensing_info_fixture(
     resp = await test_server.delete("/stop_matlab")
     assert resp.status == HTTPStatus.OK
 
-    resp = await test_server.put("/set_licensing_info", data=json.dumps(data))
+    resp = await test_server.put("/set_licensing_info", data=orjson.dumps(data))
     assert resp.status == HTTPStatus.OK
 
     # Assert whether the matlab_version was updated from None when licensing type is mhlm
@@ -869,6 +1012,7 @@ async def set_licensing_info_fixture(
     return test_server
 
 
+@pytest.mark.xdist_group("mutating")
 async def test_set_licensing_mhlm_zero_entitlement(
     mocker,
     set_licensing_info_mock_expand_token,
@@ -905,13 +1049,14 @@ async def test_set_licensing_mhlm_zero_entitlement(
     resp = await test_server.delete("/stop_matlab")
     assert resp.status == HTTPStatus.OK
 
-    resp = await test_server.put("/set_licensing_info", data=json.dumps(data))
+    resp = await test_server.put("/set_licensing_info", data=orjson.dumps(data))
     assert resp.status == HTTPStatus.OK
-    resp_json = await resp.json()
+    resp_json = orjson.loads(await resp.read())
     expectedError = EntitlementError(message="entitlement error")
     assert resp_json["error"]["type"] == type(expectedError).__name__
 
 
+@pytest.mark.xdist_group("mutating")
 async def test_set_licensing_mhlm_single_entitlement(
     mocker,
     test_server,
@@ -946,9 +1091,9 @@ async def test_set_licensing_mhlm_single_entitlement(
     resp = await test_server.delete("/stop_matlab")
     assert resp.status == HTTPStatus.OK
 
-    resp = await test_server.put("/set_licensing_info", data=json.dumps(data))
+    resp = await test_server.put("/set_licensing_info", data=orjson.dumps(data))
     assert resp.status == HTTPStatus.OK
-    resp_json = await resp.json()
+    resp_json = orjson.loads(await resp.read())
     assert len(resp_json["licensing"]["entitlements"]) == 1
     assert resp_json["licensing"]["entitlementId"] == "Entitlement3"
 
@@ -962,6 +1107,7 @@ async def test_set_licensing_mhlm_single_entitlement(
     assert resp.status == HTTPStatus.OK
 
 
+@pytest.mark.xdist_group("mutating")
 async def test_set_licensing_mhlm_multi_entitlements(
     mocker,
     test_server,
@@ -996,9 +1142,9 @@ async def test_set_licensing_mhlm_multi_entitlements(
     resp = await test_server.delete("/stop_matlab")
     assert resp.status == HTTPStatus.OK
 
-    resp = await test_server.put("/set_licensing_info", data=json.dumps(data))
+    resp = await test_server.put("/set_licensing_info", data=orjson.dumps(data))
     assert resp.status == HTTPStatus.OK
-    resp_json = await resp.json()
+    resp_json = orjson.loads(await resp.read())
     assert len(resp_json["licensing"]["entitlements"]) == 2
     assert resp_json["licensing"]["entitlementId"] == None
 
@@ -1006,7 +1152,7 @@ async def test_set_licensing_mhlm_multi_entitlements(
     # user hasn't selected the license yet
     resp = await test_server.get("/get_status")
     assert resp.status == HTTPStatus.OK
-    resp_json = json.loads(await resp.text())
+    resp_json = orjson.loads(await resp.read())
     assert resp_json["matlab"]["status"] == "down"
 
     # test-cleanup: unset licensing
@@ -1014,6 +1160,7 @@ async def test_set_licensing_mhlm_multi_entitlements(
     assert resp.status == HTTPStatus.OK
 
 
+@pytest.mark.xdist_group("mutating")
 async def test_update_entitlement_with_correct_entitlement(set_licensing_info):
     data = {
         "type": "mhlm",
@@ -1021,9 +1168,9 @@ async def test_update_entitlement_with_correct_entitlement(set_licensing_info):
     }
     # This test_server is pre-configured with multiple entitlements on app state but no entitlmentId
     test_server = set_licensing_info
-    resp = await test_server.put("/update_entitlement", data=json.dumps(data))
+    resp = await test_server.put("/update_entitlement", data=orjson.dumps(data))
     assert resp.status == HTTPStatus.OK
-    resp_json = await resp.json()
+    resp_json = orjson.loads(await resp.read())
     assert resp_json["matlab"]["status"] != "down"
 
     # test-cleanup: unset licensing
@@ -1038,7 +1185,7 @@ async def test_get_auth_token_route(test_server):
         test_server (aiohttp_client): A aiohttp_client server for sending GET request.
     """
     resp = await test_server.get("/get_auth_token")
-    res_json = await resp.json()
+    res_json = orjson.loads(await resp.read())
     # Testing the default dev configuration where the auth is disabled
     assert res_json["token"] == None
     assert resp.status == HTTPStatus.OK
@@ -1057,19 +1204,19 @@ async def test_check_for_concurrency(test_server):
 
     env_resp = await test_server.get("/get_env_config")
     assert env_resp.status == HTTPStatus.OK
-    env_resp_json = json.loads(await env_resp.text())
+    env_resp_json = orjson.loads(await env_resp.read())
     if env_resp_json["isConcurrencyEnabled"]:
         # A normal request should not repond with client id or active status
         status_resp = await test_server.get("/get_status")
         assert status_resp.status == HTTPStatus.OK
-        status_resp_json = json.loads(await status_resp.text())
+        status_resp_json = orjson.loads(await status_resp.read())
         assert "clientId" not in status_resp_json
         assert "isActiveClient" not in status_resp_json
 
         # When the request comes from the desktop app the server should respond with client id and active status
         status_resp = await test_server.get('/get_status?IS_DESKTOP="true"')
         assert status_resp.status == HTTPStatus.OK
-        status_resp_json = json.loads(await status_resp.text())
+        status_resp_json = orjson.loads(await status_resp.read())
         assert "clientId" in status_resp_json
         assert "isActiveClient" in status_resp_json
 
@@ -1078,14 +1225,14 @@ async def test_check_for_concurrency(test_server):
             '/get_status?IS_DESKTOP="true"&TRANSFER_SESSION="true"'
         )
         assert status_resp.status == HTTPStatus.OK
-        status_resp_json = json.loads(await status_resp.text())
+        status_resp_json = orjson.loads(await status_resp.read())
         assert "clientId" in status_resp_json
         assert status_resp_json["isActiveClient"] == True
 
         # When transfering the session is requested by a client whihc is not a desktop client it should be ignored
         status_resp = await test_server.get('/get_status?TRANSFER_SESSION="true"')
         assert status_resp.status == HTTPStatus.OK
-        status_resp_json = json.loads(await status_resp.text())
+        status_resp_json = orjson.loads(await status_resp.read())
         assert "clientId" not in status_resp_json
         assert "isActiveClient" not in status_resp_json
 
@@ -1094,20 +1241,20 @@ async def test_check_for_concurrency(test_server):
             '/get_status?IS_DESKTOP="true"&MWI_CLIENT_ID="foobar"&TRANSFER_SESSION="true"'
         )
         assert status_resp.status == HTTPStatus.OK
-        status_resp_json = json.loads(await status_resp.text())
+        status_resp_json = orjson.loads(await status_resp.read())
         assert "clientId" not in status_resp_json
         assert status_resp_json["isActiveClient"] == True
     else:
         # When Concurrency check is disabled the response should not contain client id or active status
         status_resp = await test_server.get("/get_status")
         assert status_resp.status == HTTPStatus.OK
-        status_resp_json = json.loads(await status_resp.text())
+        status_resp_json = orjson.loads(await status_resp.read())
         assert "clientId" not in status_resp_json
         assert "isActiveClient" not in status_resp_json
         status_resp = await test_server.get(
             '/get_status?IS_DESKTOP="true"&MWI_CLIENT_ID="foobar"&TRANSFER_SESSION="true"'
         )
         assert status_resp.status == HTTPStatus.OK
-        status_resp_json = json.loads(await status_resp.text())
+        status_resp_json = orjson.loads(await status_resp.read())
         assert "clientId" not in status_resp_json
         assert "isActiveClient" not in status_resp_json
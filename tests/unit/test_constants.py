@@ -1,6 +0,0 @@
-# Copyright 2023-2024 The MathWorks, Inc.
-
-TWO_MAX_TRIES = 2
-FIVE_MAX_TRIES = 5
-HALF_SECOND_DELAY = 0.5
-ONE_SECOND_DELAY = 1
@@ -127,7 +127,6 @@ def mock_settings_get_fixture(mocker):
 @pytest.fixture(name="test_server")
 def test_server_fixture(
     loop,
-    aiohttp_client,
     build_frontend,
     matlab_port_setup,
     mock_settings_get,
@@ -141,16 +140,15 @@ def test_server_fixture(
 
     Args:
         loop : Event Loop
-        aiohttp_client : A built-in pytest fixture
         build_frontend: Pytest fixture which generates the directory structure of static files with some placeholder content
         matlab_port_setup: Pytest fixture which monkeypatches 'MWI_DEV' env to False. This is required for the test_server to add static content
         mock_settings_get: Pytest fixture which mocks settings.get() to return dev settings when env 'MWI_DEV' is set to False.
 
     Yields:
-        [aiohttp_client]: A aiohttp_client to send HTTP requests.
+        [TestClient]: A TestClient to send HTTP requests.
     """
 
-    with FakeServer(loop, aiohttp_client) as test_server:
+    with FakeServer(loop) as test_server:
         yield test_server
 
 
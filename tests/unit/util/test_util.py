@@ -7,6 +7,12 @@ import psutil
 from matlab_proxy.util import get_child_processes, system, add_signal_handlers, prettify
 from matlab_proxy.util import system
 
+try:
+    # uvloop is not available on Windows
+    import uvloop
+except ImportError:
+    uvloop = None
+
 
 def test_get_supported_termination_signals():
     """Test to check for supported OS signals."""
@@ -23,7 +29,18 @@ def test_add_signal_handlers(loop: asyncio.AbstractEventLoop):
     loop = add_signal_handlers(loop)
 
     # In posix systems, event loop is modified with new signal handlers
-    if system.is_posix():
+    if uvloop is not None and isinstance(loop, uvloop.Loop):
+        # uvloop does not expose its signal handlers, but reports whether a handler was
+        # registered for the signal being removed. It only does so while the loop is running.
+        async def remove_signal_handlers():
+            return [
+                loop.remove_signal_handler(interrupt_signal)
+                for interrupt_signal in system.get_supported_termination_signals()
+            ]
+
+        assert all(loop.run_until_complete(remove_signal_handlers()))
+
+    elif system.is_posix():
         assert loop._signal_handlers is not None
         assert loop._signal_handlers.items() is not None
 